@@ -6,6 +6,16 @@ REQUEST_DELAY = 10
 # Maximum backoff time in seconds (5 minutes)
 MAX_BACKOFF_TIME = 300
 
+# Number of days scraped concurrently
+MAX_WORKERS = 8
+
+# Whether to extract tables from results PDFs. When enabled, text and tables come from one
+# pdfplumber pass; when disabled, only text is extracted with the much faster pypdfium2
+EXTRACT_PDF_TABLES = True
+
+# Format of the start dates shown on trial cards in the register
+REGISTER_DATE_FORMAT = "%Y-%m-%d"
+
 # Base URL for the EU Clinical Trials Register
 BASE_URL = "https://www.clinicaltrialsregister.eu/"
 
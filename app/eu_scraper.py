@@ -8,6 +8,8 @@ from .parsers.card_parser import CardParser
 from .parsers.protocol_parser import ProtocolParser
 from .parsers.result_parser import ResultParser
 
+logger = logging.getLogger(__name__)
+
 
 class EUClinicalTrialsScraper:
     """
@@ -42,8 +44,8 @@ class EUClinicalTrialsScraper:
             num_pages, num_results = self.get_num_pages_and_results(soup)
             if not num_results:
                 return self.results
-            logging.info(
-                f"Number of pages: {num_pages}, Number of results: {num_results}")
+            logger.info(
+                "Number of pages: %s, Number of results: %s", num_pages, num_results)
             self.scrape_page(soup)
             if num_pages > 1:
                 for page_number in range(2, num_pages + 1):
@@ -54,8 +56,8 @@ class EUClinicalTrialsScraper:
                     except Exception as e:
                         self.results["errors"].append(
                             f"Error scraping page {page_number}: {str(e)}")
-                        logging.error(
-                            f"Error scraping page {page_number}: {str(e)}")
+                        logger.error(
+                            "Error scraping page %s: %s", page_number, e)
 
         except Exception as e:
             self.results["errors"].append(
@@ -80,7 +82,7 @@ class EUClinicalTrialsScraper:
             data_section = soup.find("div", {"id": "tabs"})
             for card in data_section.find_all("table", {"class": "result"}):
                 self.current_trial_num += 1
-                logging.info(f"Scraping trial {self.current_trial_num}...")
+                logger.info("Scraping trial %s...", self.current_trial_num)
                 trial_data = self.get_trial_data(card)
                 self.results["successes"].append(trial_data)
         except Exception as e:
@@ -1,21 +1,64 @@
 # utils.py
 
+import gzip
 import logging
-import os
-import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+import orjson
 import pandas as pd
+import pyarrow as pa
 import pdfplumber
+import pypdfium2 as pdfium
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+import threading
 import zipfile
-from io import BytesIO, StringIO
+from io import BytesIO
+from pathlib import Path
+from typing import NamedTuple
+from .constants import EXTRACT_PDF_TABLES, REGISTER_DATE_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# Output directories are created once at import rather than on every write
+DATA_DIR = Path(__file__).parent.parent / 'data'
+DATA_DIR.mkdir(exist_ok=True)
+LOG_DIR = Path(__file__).parent.parent / 'logs'
+LOG_DIR.mkdir(exist_ok=True)
+
+# Shared by every upload: enough pooled connections for concurrent multipart uploads,
+# adaptive retries and keep-alive so successive PUTs reuse their connections
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=32,
+    retries={'mode': 'adaptive', 'max_attempts': 5},
+    tcp_keepalive=True,
+)
+
+# Large files are uploaded in parallel parts; small ones still go up in a single PUT
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True,
+)
+
+# Tables are written as zstd-compressed Parquet; the raw JSON bundle is gzipped
+PARQUET_COMPRESSION = 'zstd'
+S3_PARQUET_EXTRA_ARGS = {'ContentType': 'application/vnd.apache.parquet'}
+# no ContentEncoding, so HTTP clients download the .json.gz as is instead of decompressing it
+S3_JSON_EXTRA_ARGS = {'ContentType': 'application/gzip'}
+
+# pdfium is not thread-safe, and days are scraped in parallel threads
+_PDFIUM_LOCK = threading.Lock()
 
 
 def setup_logging():
     """
     Sets up logging for the application.
 
-    This function creates a log directory if it doesn't exist and sets up a log file with the current date as the filename.
+    This function sets up a log file in the log directory with the current date as the filename.
     The log file will contain log messages with the format: "<timestamp> <log_level>: <message>".
 
     Args:
@@ -24,10 +67,7 @@ def setup_logging():
     Returns:
         None
     """
-    log_directory = os.path.join(os.path.dirname(__file__), '..', 'logs')
-    os.makedirs(log_directory, exist_ok=True)
-    log_filename = os.path.join(
-        log_directory, datetime.now().strftime("%Y-%m-%d-%H-%M-%S") + "-run.log")
+    log_filename = LOG_DIR / (datetime.now().strftime("%Y-%m-%d-%H-%M-%S") + "-run.log")
 
     logging.basicConfig(level=logging.INFO,
                         format='%(asctime)s %(levelname)s: %(message)s',
@@ -53,23 +93,21 @@ def write_json_to_disk(json_object, query_details):
     Returns:
         None
     """
-    data_directory = os.path.join(os.path.dirname(__file__), '..', 'data')
-    os.makedirs(data_directory, exist_ok=True)
-    filename = f"""{query_details['start_date']}_{
-        query_details['end_date']}_{query_details['run_date']}.json"""
-    file_path = os.path.join(data_directory, filename)
-    with open(file_path, 'w') as f:
-        json.dump(json_object, f)
-    logging.info(f"Successfully wrote JSON to disk: {filename}")
+    start_date, end_date, run_date = query_details['start_date'], query_details['end_date'], query_details['run_date']
+    filename = f"{start_date}_{end_date}_{run_date}.json"
+    with open(DATA_DIR / filename, 'wb') as f:
+        f.write(orjson.dumps(json_object, option=orjson.OPT_NON_STR_KEYS))
+    logger.info("Successfully wrote JSON to disk: %s", filename)
 
 
 def extract_text_and_tables_from_pdf(zip_bytes):
     """
     Extracts text and tables from the first PDF file contained within a ZIP archive.
 
-    Opens the ZIP archive from bytes, reads the first PDF file, and extracts all text
-    and tables from every page using pdfplumber. The text is concatenated, and tables
-    are collected in a list.
+    Opens the ZIP archive from bytes and reads the first PDF file. When EXTRACT_PDF_TABLES
+    is enabled, text and tables come from a single pdfplumber pass over every page.
+    Otherwise only the text is extracted, using the much faster pypdfium2, and the
+    table list is empty.
 
     Args:
         zip_bytes (bytes): The byte content of the ZIP file containing the PDF.
@@ -77,23 +115,158 @@ def extract_text_and_tables_from_pdf(zip_bytes):
     Returns:
         tuple: A tuple containing all extracted text as a single string and a list of tables.
     """
-    text = ""
-    tables = []
     zip_in_memory = BytesIO(zip_bytes)
 
     with zipfile.ZipFile(zip_in_memory, 'r') as zip_ref:
         pdf_name = zip_ref.namelist()[0]
-        with zip_ref.open(pdf_name) as pdf_file_in_zip:
-            pdf_bytes = BytesIO(pdf_file_in_zip.read())
-            with pdfplumber.open(pdf_bytes) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                    page_tables = page.extract_tables()
-                    for table in page_tables:
-                        tables.append(table)
-    return text, tables
+        pdf_bytes = zip_ref.read(pdf_name)
+
+    if EXTRACT_PDF_TABLES:
+        return extract_text_and_tables_with_pdfplumber(pdf_bytes)
+    return extract_text_from_pdf(pdf_bytes), []
+
+
+def extract_text_from_pdf(pdf_bytes):
+    """
+    Extracts the text of every page of a PDF using pypdfium2.
+
+    pdfium's layout differs from pdfplumber's; its CRLF line breaks are normalized to LF.
+
+    Args:
+        pdf_bytes (bytes): The byte content of the PDF.
+
+    Returns:
+        str: The text of all pages, each followed by a newline.
+    """
+    text_parts = []
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        try:
+            for page in pdf:
+                try:
+                    text_page = page.get_textpage()
+                    try:
+                        page_text = text_page.get_text_range().replace("\r\n", "\n")
+                    finally:
+                        text_page.close()
+                finally:
+                    page.close()
+                if page_text:
+                    text_parts.append(page_text + "\n")
+        finally:
+            pdf.close()
+    return "".join(text_parts)
+
+
+def extract_text_and_tables_with_pdfplumber(pdf_bytes):
+    """
+    Extracts the text and tables of every page of a PDF in one pdfplumber pass.
+
+    Args:
+        pdf_bytes (bytes): The byte content of the PDF.
+
+    Returns:
+        tuple: All page text as a single string and a list of tables, each a list of rows.
+    """
+    text_parts = []
+    tables = []
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text_parts.append(page_text + "\n")
+            tables.extend(page.extract_tables())
+    return "".join(text_parts), tables
+
+
+class CardRow(NamedTuple):
+    """A row of the trial info cards table, before dates are parsed."""
+    eudract_number: str
+    start_date: str
+    sponsor_name: str
+    full_title: str
+    version: str
+    soc_term: str
+    classification_code: str
+    term: str
+    level: str
+
+
+class ProtocolRow(NamedTuple):
+    """A row of the trial protocols table, before the protocol id is derived."""
+    eudract_number: str
+    url: str
+
+
+class ResultRow(NamedTuple):
+    """A row of the trial results table."""
+    eudract_number: str
+    version: str
+    url: str
+
+
+# Fixed Parquet schemas, so every day's files have the same types even when a table is empty
+CARDS_SCHEMA = pa.schema([
+    ('eudract_number', pa.string()),
+    ('start_date', pa.timestamp('ns')),
+    ('sponsor_name', pa.string()),
+    ('full_title', pa.string()),
+    ('version', pa.string()),
+    ('soc_term', pa.string()),
+    ('classification_code', pa.string()),
+    ('term', pa.string()),
+    ('level', pa.string()),
+])
+PROTOCOLS_SCHEMA = pa.schema([
+    ('protocol_id', pa.string()),
+    ('eudract_number', pa.string()),
+    ('url', pa.string()),
+])
+RESULTS_SCHEMA = pa.schema([
+    ('eudract_number', pa.string()),
+    ('version', pa.string()),
+    ('url', pa.string()),
+])
+
+
+def _flatten_trial(result):
+    """
+    Flattens a single scraped trial into its card, protocol, and result rows.
+
+    Replaces a truncated card title with the full title from the first protocol.
+
+    Args:
+        result (dict): The scraped trial data with "card", "protocols" and optional "results" keys.
+
+    Returns:
+        tuple: The CardRow, a list of ProtocolRow, and a list of ResultRow.
+    """
+    trial_info_card = result["card"]
+    card_disease = trial_info_card["disease"]
+    eudract_number = trial_info_card['eudract_number']
+    protocols = result['protocols']
+
+    if trial_info_card['full_title'].endswith('...'):
+        trial_info_card['full_title'] = protocols[0]["A. Protocol Information"]["Full title of the trial"][0]
+
+    card_row = CardRow(
+        eudract_number,
+        trial_info_card['start_date'],
+        trial_info_card['sponsor_name'],
+        trial_info_card['full_title'],
+        card_disease['version'],
+        card_disease['soc_term'],
+        card_disease['classification_code'],
+        card_disease['term'],
+        card_disease['level'],
+    )
+    protocols_rows = [ProtocolRow(eudract_number, protocol['url']) for protocol in protocols]
+    results = result.get('results') or {}
+    results_rows = [
+        ResultRow(eudract_number, version, value['summary']['url'])
+        for version, value in results.items()
+    ]
+    return card_row, protocols_rows, results_rows
 
 
 def get_json_data_in_pandas(json_data):
@@ -115,101 +288,109 @@ def get_json_data_in_pandas(json_data):
     if not json_data["successes"] or len(json_data["successes"]) < 1:
         return None, None, None
 
-    trial_info_cards_columns = ['eudract_number', 'start_date', 'sponsor_name',
-                                'full_title', 'version', 'soc_term', 'classification_code', 'term', 'level', 'json']
-    trial_protocols_columns = ['protocol_id', 'eudract_number', 'url',  'json']
-    trial_results_columns = ['eudract_number', 'version', 'url', 'json']
-    cards_df = pd.DataFrame(columns=trial_info_cards_columns)
-    protocols_df = pd.DataFrame(columns=trial_protocols_columns)
-    results_df = pd.DataFrame(columns=trial_results_columns)
+    cards_rows = []
+    protocols_rows = []
+    results_rows = []
 
     for result in json_data["successes"]:
         if not result:
             continue
-        trial_info_card = result["card"]
-        card_disease = trial_info_card["disease"]
-        eudract_number = trial_info_card['eudract_number']
-        trial_start_date = pd.to_datetime(trial_info_card['start_date'], errors='coerce')
-        protocols = result['protocols']
-        if pd.isnull(trial_start_date):
-            trial_start_date = None
-
-        if trial_info_card['full_title'].endswith('...'):
-            trial_info_card['full_title'] = protocols[0]["A. Protocol Information"]["Full title of the trial"][0]
-
-        new_card_info_row = [
-            eudract_number,
-            trial_start_date,
-            trial_info_card['sponsor_name'],
-            trial_info_card['full_title'],
-            card_disease['version'],
-            card_disease['soc_term'],
-            card_disease['classification_code'],
-            card_disease['term'],
-            card_disease['level'],
-            json.dumps(result)
-        ]
-        cards_df.loc[len(cards_df)] = new_card_info_row
-
-        # protocol id is unique because it combines the eudract number and the protocol letters/digits
-        for protocol in protocols:
-            protocol_id = protocol['url'].split('/')
-            protocol_id = '-'.join(protocol_id[-2:])
-
-            protocols_df.loc[len(protocols_df)] = [protocol_id, eudract_number, protocol['url'], json.dumps(protocol)]
-
-        results = result['results'] if 'results' in result else None
-        if not results:
-            continue
-        for version, value in results.items():
-            results_df.loc[len(results_df)] = [eudract_number, version, value['summary']['url'], json.dumps(value)]
-        logging.info(f"Cards: {cards_df.shape}, Protocols: {protocols_df.shape}, Results: {results_df.shape}")
+        card_row, trial_protocols_rows, trial_results_rows = _flatten_trial(result)
+        cards_rows.append(card_row)
+        protocols_rows.extend(trial_protocols_rows)
+        results_rows.extend(trial_results_rows)
+
+    # build each DataFrame once from tuples; growing them row by row with .loc is quadratic
+    cards_df = pd.DataFrame.from_records(cards_rows, columns=CardRow._fields)
+    protocols_df = pd.DataFrame.from_records(protocols_rows, columns=ProtocolRow._fields)
+    results_df = pd.DataFrame.from_records(results_rows, columns=ResultRow._fields)
+
+    # dates and protocol ids are derived column-wise rather than per row
+    # the register's format is fixed, so skip pandas' format inference; malformed dates become NaT
+    cards_df['start_date'] = pd.to_datetime(cards_df['start_date'], errors='coerce', format=REGISTER_DATE_FORMAT)
+    # protocol id is unique because it combines the eudract number and the protocol letters/digits
+    protocol_ids = None
+    if not protocols_df.empty:
+        url_parts = protocols_df['url'].str.rsplit('/', n=2, expand=True)
+        protocol_ids = url_parts[1] + '-' + url_parts[2]
+    protocols_df.insert(0, 'protocol_id', protocol_ids)
+
+    logger.info("Cards: %s, Protocols: %s, Results: %s", cards_df.shape, protocols_df.shape, results_df.shape)
     return cards_df, protocols_df, results_df
 
 
-def write_csv_to_s3(json_object, query_details, bucket, key, access_key):
+@lru_cache(maxsize=1)
+def _get_s3_client(key, access_key):
+    """
+    Returns an S3 client for the given credentials, reusing it across calls.
+
+    Args:
+        key (str): The AWS access key id.
+        access_key (str): The AWS secret access key.
+
+    Returns:
+        botocore.client.S3: The S3 client.
+    """
+    session = boto3.Session(
+        aws_access_key_id=key,
+        aws_secret_access_key=access_key,
+    )
+    return session.client('s3', region_name='us-east-1', config=S3_CLIENT_CONFIG)
+
+
+def write_parquet_to_s3(json_object, query_details, bucket, key, access_key):
     """
-    Writes trial information, protocols, and results data to CSV files on disk.
+    Writes trial information, protocols, and results data to Parquet files on S3.
 
     Takes JSON object containing trial data, converts it to pandas DataFrames,
-    and writes these DataFrames to CSV files in a specified data directory.
+    and uploads these DataFrames as Parquet files under the given key in the bucket.
     Filenames are generated based on query details.
 
     Args:
         json_object (dict): The JSON object containing trial data.
         query_details (dict): A dictionary containing details about the query, including start date, end date, and run date.
     """
-    data_directory = os.path.join(os.path.dirname(__file__), '..', 'data')
-    os.makedirs(data_directory, exist_ok=True)
-    cards_filename = f"trial_info_cards_{query_details['start_date']}_{query_details['end_date']}_{query_details['run_date']}.csv"
-    protocols_filename = f"trial_protocols_{query_details['start_date']}_{query_details['end_date']}_{query_details['run_date']}.csv"
-    results_filename = f"trial_results_{query_details['start_date']}_{query_details['end_date']}_{query_details['run_date']}.csv"
-    cards_file_path = os.path.join(data_directory, cards_filename)
-    protocols_file_path = os.path.join(data_directory, protocols_filename)
-    results_file_path = os.path.join(data_directory, results_filename)
+    start_date, end_date, run_date = query_details['start_date'], query_details['end_date'], query_details['run_date']
+    prefix = f"{start_date}_{end_date}_{run_date}"
+    cards_filename = f"trial_info_cards_{prefix}.parquet"
+    protocols_filename = f"trial_protocols_{prefix}.parquet"
+    results_filename = f"trial_results_{prefix}.parquet"
+    json_filename = f"trial_json_{prefix}.json.gz"
 
     cards_df, protocols_df, results_df = get_json_data_in_pandas(json_object)
     if cards_df is None or protocols_df is None or results_df is None:
-        logging.warning(f"Failed to write data to disk. No data to write for {query_details['start_date']} to {query_details['end_date']}")
+        logger.warning("Failed to write data to disk. No data to write for %s to %s",
+                       start_date, end_date)
         return
 
-    cards_df_buffer = StringIO()
-    cards_df.to_csv(cards_df_buffer, index=False)
-    protocols_df_buffer = StringIO()
-    protocols_df.to_csv(protocols_df_buffer, index=False)
-    results_df_buffer = StringIO()
-    results_df.to_csv(results_df_buffer, index=False)
-    session = boto3.Session(
-        aws_access_key_id= key,
-        aws_secret_access_key= access_key,
-    )
-    s3 = session.client('s3', region_name='us-east-1')
-    s3.put_object(Bucket=bucket, Key=f"{key}/{cards_filename}", Body=cards_df_buffer.getvalue())
-    logging.info(f"Data written to s3://{bucket}/{key}/{cards_filename}")
-    s3.put_object(Bucket=bucket, Key=f"{key}/{protocols_filename}", Body=protocols_df_buffer.getvalue())
-    logging.info(f"Data written to s3://{bucket}/{key}/{protocols_filename}")
-    s3.put_object(Bucket=bucket, Key=f"{key}/{results_filename}", Body=results_df_buffer.getvalue())
-    logging.info(f"Data written to s3://{bucket}/{key}/{results_filename}")
-    
-
-
+    # serialize straight to bytes so each table is held in memory only once
+    cards_df_buffer = BytesIO()
+    cards_df.to_parquet(cards_df_buffer, engine='pyarrow', compression=PARQUET_COMPRESSION, index=False,
+                        schema=CARDS_SCHEMA)
+    protocols_df_buffer = BytesIO()
+    protocols_df.to_parquet(protocols_df_buffer, engine='pyarrow', compression=PARQUET_COMPRESSION, index=False,
+                            schema=PROTOCOLS_SCHEMA)
+    results_df_buffer = BytesIO()
+    results_df.to_parquet(results_df_buffer, engine='pyarrow', compression=PARQUET_COMPRESSION, index=False,
+                          schema=RESULTS_SCHEMA)
+    # the raw scrape is stored once as its own object, named in each table's S3 metadata
+    json_buffer = BytesIO(gzip.compress(orjson.dumps(json_object, option=orjson.OPT_NON_STR_KEYS), compresslevel=1))
+    table_extra_args = {**S3_PARQUET_EXTRA_ARGS, 'Metadata': {'raw-json': json_filename}}
+    s3 = _get_s3_client(key, access_key)
+    uploads = [
+        (cards_filename, cards_df_buffer, table_extra_args),
+        (protocols_filename, protocols_df_buffer, table_extra_args),
+        (results_filename, results_df_buffer, table_extra_args),
+        (json_filename, json_buffer, S3_JSON_EXTRA_ARGS),
+    ]
+    # the objects are independent, so upload them concurrently
+    with ThreadPoolExecutor(max_workers=len(uploads)) as executor:
+        futures = {}
+        for filename, buffer, extra_args in uploads:
+            buffer.seek(0)
+            future = executor.submit(s3.upload_fileobj, buffer, bucket, f"{key}/{filename}",
+                                     ExtraArgs=extra_args, Config=S3_TRANSFER_CONFIG)
+            futures[future] = filename
+    for future, filename in futures.items():
+        future.result()
+        logger.info("Data written to s3://%s/%s/%s", bucket, key, filename)
@@ -1,12 +1,16 @@
 # main.py
 import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from itertools import islice
+from app.constants import MAX_WORKERS
 from app.eu_scraper import EUClinicalTrialsScraper
-from app.utils import setup_logging, write_csv_to_s3, write_json_to_disk
+from app.utils import setup_logging, write_parquet_to_s3, write_json_to_disk
 import logging
 import os
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
 
 
 def parse_args():
@@ -32,23 +36,33 @@ def validate_dates(start_date, end_date):
 def scrape_by_date_range(start_date, end_date):
     scraper = EUClinicalTrialsScraper(start_date, end_date)
     results = scraper.scrape_trials()
+    start_date_str = start_date.strftime("%Y-%m-%d")
+    end_date_str = end_date.strftime("%Y-%m-%d")
+    run_date = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
     output = {
         "metadata": {
-            "query_start_date": start_date.strftime("%Y-%m-%d"),
-            "query_end_date": end_date.strftime("%Y-%m-%d"),
-            "run_start_datetime": datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+            "query_start_date": start_date_str,
+            "query_end_date": end_date_str,
+            "run_start_datetime": run_date
         },
         "errors": results["errors"],
         "successes": results["successes"]
     }
     query_details = {
-        "start_date": start_date.strftime("%Y-%m-%d"),
-        "end_date": end_date.strftime("%Y-%m-%d"),
-        "run_date": datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+        "start_date": start_date_str,
+        "end_date": end_date_str,
+        "run_date": run_date
     }
     return output, query_details
 
 
+def scrape_day(current_date):
+    logger.info("Scraping data for %s", current_date)
+    output, query_details = scrape_by_date_range(current_date, current_date)
+    logger.info("Scraping complete for %s", current_date)
+    return output, query_details
+
+
 def main():
     setup_logging()
     load_dotenv()
@@ -56,21 +70,34 @@ def main():
 
     start_date, end_date = validate_dates(args.start_date, args.end_date)
 
-    current_date = start_date
-    while current_date <= end_date:
-        logging.info(f"Scraping data for {current_date}")
-        output, query_details = scrape_by_date_range(
-            current_date, current_date)
-        logging.info(f"Scraping complete for {current_date}")
-
-        KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
-        ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
-        BUCKET_NAME = os.environ.get('BUCKET_NAME')
-                                    
-        write_csv_to_s3(output, query_details, BUCKET_NAME, KEY_ID, ACCESS_KEY)
-        
-        current_date += timedelta(days=1)
+    KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
+    ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
+    BUCKET_NAME = os.environ.get('BUCKET_NAME')
+
+    dates = (start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1))
 
+    # days are independent, so scrape them concurrently and upload from the main thread;
+    # at most MAX_WORKERS days are in flight so each day's data is freed once it is uploaded
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {executor.submit(scrape_day, date): date for date in islice(dates, MAX_WORKERS)}
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                current_date = futures.pop(future)
+                next_date = next(dates, None)
+                if next_date is not None:
+                    futures[executor.submit(scrape_day, next_date)] = next_date
+                try:
+                    output, query_details = future.result()
+                except Exception as e:
+                    logger.error("Scraping failed for %s: %s", current_date, e)
+                    continue
+                try:
+                    write_parquet_to_s3(output, query_details, BUCKET_NAME, KEY_ID, ACCESS_KEY)
+                except Exception as e:
+                    logger.error("Writing data failed for %s: %s", current_date, e)
+                del output
+            del done, future
 
 if __name__ == "__main__":
     main()
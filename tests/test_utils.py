@@ -0,0 +1,126 @@
+# test_utils.py
+import zipfile
+from io import BytesIO
+from unittest import mock
+
+from app import utils
+
+
+def make_pdf(lines):
+    """
+    Builds a minimal single-page PDF showing each line of text in Helvetica.
+
+    Args:
+        lines (list of str): The lines of text to place on the page.
+
+    Returns:
+        bytes: The PDF file content.
+    """
+    text_ops = "".join(f"({line}) Tj 0 -20 Td " for line in lines)
+    stream = f"BT /F1 12 Tf 72 720 Td {text_ops}ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = BytesIO()
+    pdf.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(pdf.tell())
+        pdf.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref_offset = pdf.tell()
+    pdf.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        pdf.write(f"{offset:010d} 00000 n \n".encode())
+    pdf.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+              f"startxref\n{xref_offset}\n%%EOF\n".encode())
+    return pdf.getvalue()
+
+
+def make_zip(pdf_bytes):
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.writestr("results.pdf", pdf_bytes)
+    return zip_buffer.getvalue()
+
+
+def test_extract_text_from_pdf():
+    text = utils.extract_text_from_pdf(make_pdf(["Trial results", "Summary"]))
+
+    assert "Trial results" in text
+    assert "Summary" in text
+    assert "\r" not in text
+    assert text.endswith("\n")
+
+
+def test_extract_text_and_tables_from_pdf_without_tables():
+    zip_bytes = make_zip(make_pdf(["Trial results"]))
+
+    with mock.patch.object(utils, "EXTRACT_PDF_TABLES", False), \
+            mock.patch.object(utils, "extract_text_and_tables_with_pdfplumber") as pdfplumber_pass:
+        text, tables = utils.extract_text_and_tables_from_pdf(zip_bytes)
+
+    pdfplumber_pass.assert_not_called()
+    assert "Trial results" in text
+    assert tables == []
+
+
+def test_extract_text_and_tables_from_pdf_with_tables():
+    zip_bytes = make_zip(make_pdf(["Trial results"]))
+
+    with mock.patch.object(utils, "EXTRACT_PDF_TABLES", True), \
+            mock.patch.object(utils, "extract_text_from_pdf") as pdfium_pass:
+        text, tables = utils.extract_text_and_tables_from_pdf(zip_bytes)
+
+    pdfium_pass.assert_not_called()
+    assert "Trial results" in text
+    assert tables == []
+
+
+def make_trial(eudract_number, protocol_countries=("DE",), results=None):
+    trial = {
+        "card": {
+            "eudract_number": eudract_number,
+            "start_date": "2004-04-01",
+            "sponsor_name": "Sponsor",
+            "full_title": "Title",
+            "disease": {"version": "1", "soc_term": "Term", "classification_code": "1",
+                        "term": "Term", "level": "LLT"},
+        },
+        "protocols": [{"url": f"https://www.clinicaltrialsregister.eu/ctr-search/trial/{eudract_number}/{country}"}
+                      for country in protocol_countries],
+    }
+    if results:
+        trial["results"] = results
+    return trial
+
+
+def test_get_json_data_in_pandas_matches_schemas():
+    json_data = {"successes": [
+        make_trial("2004-000001-01", results={"v1": {"summary": {"url": "https://example.org/results"}}}),
+        None,
+    ]}
+
+    cards_df, protocols_df, results_df = utils.get_json_data_in_pandas(json_data)
+
+    assert list(cards_df.columns) == utils.CARDS_SCHEMA.names
+    assert list(protocols_df.columns) == utils.PROTOCOLS_SCHEMA.names
+    assert list(results_df.columns) == utils.RESULTS_SCHEMA.names
+    assert protocols_df['protocol_id'].tolist() == ["2004-000001-01-DE"]
+    assert results_df['version'].tolist() == ["v1"]
+
+
+def test_get_json_data_in_pandas_without_protocols_or_results():
+    cards_df, protocols_df, results_df = utils.get_json_data_in_pandas(
+        {"successes": [make_trial("2004-000001-01", protocol_countries=())]})
+
+    assert len(cards_df) == 1
+    assert protocols_df.empty and list(protocols_df.columns) == utils.PROTOCOLS_SCHEMA.names
+    assert results_df.empty and list(results_df.columns) == utils.RESULTS_SCHEMA.names
+    # empty tables still serialize against their fixed schemas
+    for df, schema in ((protocols_df, utils.PROTOCOLS_SCHEMA), (results_df, utils.RESULTS_SCHEMA)):
+        df.to_parquet(BytesIO(), engine='pyarrow', index=False, schema=schema)